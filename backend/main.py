@@ -1,37 +1,74 @@
 from fastapi import FastAPI
 from pydantic import BaseModel
 from fastapi.middleware.cors import CORSMiddleware
-import requests
+from fastapi.responses import ORJSONResponse
+import httpx
 import os
 import sqlite3
 import hashlib
+import hmac
+import re
+import logging
+import time
+import json
+import threading
+import asyncio
+from cachetools import LRUCache, TTLCache
 
 # ================== PATHS ==================
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-DB_PATH = os.path.join(BASE_DIR, "chat.db")
+DB_PATH = os.getenv("DB_PATH", os.path.join(BASE_DIR, "chat.db"))
 
 # ================== DATABASE ==================
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    # One shared autocommit connection in WAL mode
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None)
     conn.row_factory = sqlite3.Row
+    conn.executescript("""
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA cache_size=-64000;
+    """)
     return conn
 
 db = get_db()
+# Serializes writes on the shared connection
+db_lock = threading.Lock()
+
+def write_db(query: str, params=()):
+    # Run via asyncio.to_thread so commits don't stall the event loop
+    with db_lock:
+        db.execute(query, params)
 
 db.execute("""
 CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     username TEXT UNIQUE,
-    password TEXT
+    password BLOB,
+    salt BLOB
 )
 """)
-db.commit()
+# Older databases predate the salt column
+if "salt" not in [c["name"] for c in db.execute("PRAGMA table_info(users)")]:
+    try:
+        db.execute("ALTER TABLE users ADD COLUMN salt BLOB")
+    except sqlite3.OperationalError as e:
+        # Another worker added it between the check and the ALTER
+        if "duplicate column name" not in str(e):
+            raise
+
+# Hot queries kept as constants so sqlite3's per-connection statement cache hits
+SQL_INSERT_USER = "INSERT INTO users (username, password, salt) VALUES (?, ?, ?)"
+SQL_USER_BY_NAME = "SELECT id, password, salt FROM users WHERE username=?"
+SQL_UPDATE_PASSWORD = "UPDATE users SET password=?, salt=? WHERE id=?"
+SQL_USER_BY_ID = "SELECT id FROM users WHERE id=?"
 
 # ================== APP ==================
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -52,28 +89,54 @@ class ChatRequest(BaseModel):
 
 # ================== AUTH HELPERS ==================
 
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+def hash_password(password: str, salt: bytes) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=2**14, r=8, p=1, dklen=32)
 
-def verify_password(password: str, hashed: str) -> bool:
-    return hash_password(password) == hashed
+def verify_password(password: str, hashed, salt) -> bool:
+    # Rows without a salt hold a legacy unsalted SHA-256 hex digest
+    if salt is None:
+        # Spend one scrypt anyway so legacy rows cost the same as the rest
+        hash_password(password, DUMMY_SALT)
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy.encode(), str(hashed).encode())
+    return hmac.compare_digest(hash_password(password, salt), hashed)
+
+# Verified against for unknown usernames so they cost the same as real ones
+DUMMY_SALT = os.urandom(16)
+DUMMY_HASH = hash_password("", DUMMY_SALT)
 
 # ================== USER MEMORY ==================
 
-# In-memory preference store
+# In-memory preference store, bounded to the most recent users
 # { user_id: "AI" | "TECH" | None }
-user_memory = {}
+user_memory = LRUCache(maxsize=100_000)
 
 # ================== NEWS ==================
 
 NEWS_API_KEY = os.getenv("NEWS_API_KEY")
 
-def fetch_news(query: str):
+logger = logging.getLogger(__name__)
+
+# Shared async HTTP client, opened on startup
+client = None
+
+@app.on_event("startup")
+async def open_client():
+    global client
+    client = httpx.AsyncClient(timeout=5, http2=True)
+
+@app.on_event("shutdown")
+async def close_client():
+    if client is not None:
+        await client.aclose()
+
+async def fetch_news_upstream(query: str):
+    # Returns None when NewsAPI fails, [] when it simply has nothing
     if not NEWS_API_KEY:
         return []
 
     try:
-        response = requests.get(
+        response = await client.get(
             "https://newsapi.org/v2/everything",
             params={
                 "q": query,
@@ -81,115 +144,344 @@ def fetch_news(query: str):
                 "sortBy": "publishedAt",
                 "pageSize": 5,
                 "apiKey": NEWS_API_KEY
-            },
-            timeout=6
+            }
         )
+        response.raise_for_status()
         data = response.json()
-        return [a["title"] for a in data.get("articles", []) if a.get("title")]
-    except Exception:
+        articles = data.get("articles") if isinstance(data, dict) else None
+        if not isinstance(articles, list):
+            raise ValueError("unexpected newsapi payload")
+        return [
+            a["title"] for a in articles
+            if isinstance(a, dict) and isinstance(a.get("title"), str) and a["title"]
+        ]
+    except (httpx.HTTPError, ValueError):
+        logger.warning("newsapi failed for %r", query, exc_info=True)
+        return None
+
+# ================== SHARED CACHE ==================
+
+# Optional Redis L2 cache shared by all workers
+REDIS_URL = os.getenv("REDIS_URL")
+SHARED_NEWS_TTL = 60
+
+redis_client = None
+# Rebound to redis.exceptions.RedisError once Redis is enabled
+RedisError = ()
+
+@app.on_event("startup")
+async def open_redis():
+    global redis_client, RedisError
+    if REDIS_URL:
+        # Imported here so redis is only needed when REDIS_URL is set
+        import redis.asyncio as aioredis
+        from redis.exceptions import RedisError
+        # Short timeouts: callers hold the per-query news lock while waiting
+        redis_client = aioredis.from_url(
+            REDIS_URL, socket_timeout=0.2, socket_connect_timeout=0.2
+        )
+
+@app.on_event("shutdown")
+async def close_redis():
+    if redis_client is not None:
+        await redis_client.aclose()
+
+async def get_shared_news(query: str):
+    # Returns (titles, age in seconds) or None
+    if redis_client is None:
+        return None
+    try:
+        raw = await redis_client.get(f"news:{query}")
+    except RedisError:
+        logger.warning("redis get failed for %r", query, exc_info=True)
+        return None
+    if raw is None:
+        return None
+    try:
+        entry = json.loads(raw)
+        return entry["titles"], max(0.0, time.time() - entry["fetched_at"])
+    except (ValueError, KeyError, TypeError):
+        logger.warning("ignoring malformed redis entry for %r", query, exc_info=True)
+        return None
+
+async def set_shared_news(query: str, titles):
+    if redis_client is None:
+        return
+    entry = json.dumps({"titles": titles, "fetched_at": time.time()})
+    try:
+        await redis_client.setex(f"news:{query}", SHARED_NEWS_TTL, entry)
+    except RedisError:
+        logger.warning("redis set failed for %r", query, exc_info=True)
+
+# ================== NEWS CACHE ==================
+
+NEWS_TTL = 60
+# Entries older than NEWS_TTL are still served, while refreshing, up to this age
+NEWS_STALE_TTL = 600
+# Queries the chat endpoint can ask for
+NEWS_QUERIES = ("AI", "technology", "news")
+
+# { query: (titles, fetched_at) }
+news_cache = {}
+# Queries that just failed upstream, so a flaky NewsAPI isn't retried every turn
+news_failures = TTLCache(maxsize=16, ttl=10)
+# One lock per query so concurrent misses share a single upstream call
+news_locks = {}
+# { query: task } for background refreshes already in flight
+news_refreshing = {}
+
+async def fetch_and_store(query: str, max_shared_age: float = SHARED_NEWS_TTL):
+    # Caller holds the query's lock
+    shared = await get_shared_news(query)
+    if shared is not None and shared[1] < max_shared_age:
+        titles, age = shared
+        news_cache[query] = (titles, time.monotonic() - age)
+        return titles
+
+    titles = await fetch_news_upstream(query)
+    if titles is None:
+        # Keep whatever is cached; it may still be served stale
+        news_failures[query] = True
         return []
+    news_cache[query] = (titles, time.monotonic())
+    await set_shared_news(query, titles)
+    return titles
+
+def cached_news(query: str, max_age: float):
+    entry = news_cache.get(query)
+    if entry and time.monotonic() - entry[1] < max_age:
+        return entry[0]
+    return None
+
+async def fetch_news(query: str):
+    titles = cached_news(query, NEWS_TTL)
+    if titles is not None:
+        return titles
+
+    titles = cached_news(query, NEWS_STALE_TTL)
+    if titles is not None:
+        schedule_refresh(query)
+        return titles
+
+    if query in news_failures:
+        return []
+
+    lock = news_locks.setdefault(query, asyncio.Lock())
+    async with lock:
+        titles = cached_news(query, NEWS_STALE_TTL)
+        if titles is not None:
+            return titles
+        if query in news_failures:
+            return []
+        return await fetch_and_store(query)
+
+async def refresh_news(query: str, max_shared_age: float = SHARED_NEWS_TTL):
+    lock = news_locks.setdefault(query, asyncio.Lock())
+    async with lock:
+        await fetch_and_store(query, max_shared_age)
+
+def schedule_refresh(query: str):
+    if query in news_refreshing or query in news_failures:
+        return
+    task = asyncio.create_task(refresh_news(query))
+    news_refreshing[query] = task
+    task.add_done_callback(lambda _: news_refreshing.pop(query, None))
+
+# ================== NEWS WARMER ==================
+
+WARM_INTERVAL = NEWS_TTL - 5
+# A shared copy older than this would go stale before the next warm-up
+WARM_MAX_SHARED_AGE = NEWS_TTL - WARM_INTERVAL
+
+warm_task = None
+
+async def warm_loop():
+    # Refresh slightly inside the TTL so hot entries never lapse
+    while True:
+        results = await asyncio.gather(
+            *(refresh_news(q, WARM_MAX_SHARED_AGE) for q in NEWS_QUERIES),
+            return_exceptions=True
+        )
+        for query, result in zip(NEWS_QUERIES, results):
+            if isinstance(result, Exception):
+                logger.error("news warm-up failed for %r", query, exc_info=result)
+        await asyncio.sleep(WARM_INTERVAL)
+
+@app.on_event("startup")
+async def start_warmer():
+    global warm_task
+    if NEWS_API_KEY:
+        warm_task = asyncio.create_task(warm_loop())
+
+@app.on_event("shutdown")
+async def stop_warmer():
+    if warm_task is not None:
+        warm_task.cancel()
+
+def trim_headline(h):
+    return h if len(h) <= 90 else h[:87] + "..."
 
 def clean_headlines(headlines):
-    cleaned = []
-    for h in headlines:
-        if " - " in h:
-            h = h.split(" - ")[0]
-        if len(h) > 90:
-            h = h[:87] + "..."
-        cleaned.append(h)
-    return cleaned[:3]
+    # Drop the " - Source" suffix from the first three headlines only
+    return [trim_headline(h.partition(" - ")[0]) for h in headlines[:3]]
+
+NO_UPDATES = "No major updates right now."
 
 def summarize(headlines, category):
     if len(headlines) < 2:
-        return "No major updates right now."
+        return NO_UPDATES
     return f"{category} update: {headlines[0]} and {headlines[1]}."
 
 # ================== HEALTH ==================
 
 @app.get("/")
-def health():
+async def health():
     return {"status": "Backend running 🚀"}
 
 # ================== AUTH ==================
 
 @app.post("/register")
-def register(data: AuthRequest):
+async def register(data: AuthRequest):
+    salt = os.urandom(16)
+    hashed = await asyncio.to_thread(hash_password, data.password, salt)
     try:
-        db.execute(
-            "INSERT INTO users (username, password) VALUES (?, ?)",
-            (data.username, hash_password(data.password))
+        await asyncio.to_thread(
+            write_db,
+            SQL_INSERT_USER,
+            (data.username, hashed, salt)
         )
-        db.commit()
         return {"status": "registered"}
     except sqlite3.IntegrityError:
         return {"error": "Username already exists"}
 
 @app.post("/login")
-def login(data: AuthRequest):
+async def login(data: AuthRequest):
     row = db.execute(
-        "SELECT id, password FROM users WHERE username=?",
+        SQL_USER_BY_NAME,
         (data.username,)
     ).fetchone()
 
-    if not row or not verify_password(data.password, row["password"]):
+    if not row:
+        await asyncio.to_thread(verify_password, data.password, DUMMY_HASH, DUMMY_SALT)
         return {"error": "Invalid credentials"}
 
+    if not await asyncio.to_thread(
+        verify_password, data.password, row["password"], row["salt"]
+    ):
+        return {"error": "Invalid credentials"}
+
+    # Upgrade legacy SHA-256 rows to scrypt on successful login
+    if row["salt"] is None:
+        salt = os.urandom(16)
+        hashed = await asyncio.to_thread(hash_password, data.password, salt)
+        await asyncio.to_thread(write_db, SQL_UPDATE_PASSWORD, (hashed, salt, row["id"]))
+
     return {"user_id": row["id"]}
 
-# ================== CHAT ==================
+# ================== KEYWORDS ==================
 
-@app.post("/chat")
-def chat(data: ChatRequest):
-    if not data.message.strip():
-        return {"reply": "Empty message."}
+# Trigger phrases in priority order
+KEYWORDS = ("only ai news", "only tech news", "reset", "ai", "tech", "news")
+# ASCII-only case folding, so every match lowercases back to a KEYWORDS entry
+KEYWORD_PATTERN = re.compile(
+    "|".join(map(re.escape, KEYWORDS)), re.IGNORECASE | re.ASCII
+)
+KEYWORD_RANK = {k: i for i, k in enumerate(KEYWORDS)}
 
-    user = db.execute(
-        "SELECT id FROM users WHERE id=?",
-        (data.user_id,)
-    ).fetchone()
+def match_keyword(message: str):
+    # Single scan; highest-priority phrase wins, as with the old elif ladder
+    found = KEYWORD_PATTERN.findall(message)
+    if not found:
+        return None
+    return min((f.lower() for f in found), key=KEYWORD_RANK.__getitem__)
 
-    if not user:
-        return {"reply": "Invalid user. Please login again."}
+# ================== CHAT ACTIONS ==================
 
-    user_memory.setdefault(data.user_id, None)
+HELP_REPLY = "Ask for AI news, tech news, or general news."
 
-    text = data.message.lower()
-    pref = user_memory[data.user_id]
+async def lock_ai(user_id: int):
+    user_memory[user_id] = "AI"
+    return "Locked to AI news 🤖"
 
-    if "only ai news" in text:
-        user_memory[data.user_id] = "AI"
-        reply = "Locked to AI news 🤖"
+async def lock_tech(user_id: int):
+    user_memory[user_id] = "TECH"
+    return "Locked to tech news 💻"
 
-    elif "only tech news" in text:
-        user_memory[data.user_id] = "TECH"
-        reply = "Locked to tech news 💻"
+async def reset_prefs(user_id: int):
+    user_memory.pop(user_id, None)
+    return "Preferences reset."
 
-    elif "reset" in text:
-        user_memory[data.user_id] = None
-        reply = "Preferences reset."
+async def ai_news(user_id: int):
+    return summarize(clean_headlines(await fetch_news("AI")), "AI")
 
-    elif pref == "AI":
-        reply = summarize(clean_headlines(fetch_news("AI")), "AI")
+async def tech_news(user_id: int):
+    return summarize(clean_headlines(await fetch_news("technology")), "TECH")
 
-    elif pref == "TECH":
-        reply = summarize(clean_headlines(fetch_news("technology")), "TECH")
+async def general_news(user_id: int):
+    return summarize(clean_headlines(await fetch_news("news")), "GENERAL")
 
-    elif "ai" in text:
-        reply = summarize(clean_headlines(fetch_news("AI")), "AI")
+async def help_reply(user_id: int):
+    return HELP_REPLY
 
-    elif "tech" in text:
-        reply = summarize(clean_headlines(fetch_news("technology")), "TECH")
+# { matched keyword: action }
+ACTIONS = {
+    "only ai news": lock_ai,
+    "only tech news": lock_tech,
+    "reset": reset_prefs,
+    "ai": ai_news,
+    "tech": tech_news,
+    "news": general_news,
+    None: help_reply,
+}
 
-    elif "news" in text:
-        reply = summarize(clean_headlines(fetch_news("news")), "GENERAL")
+# A locked preference overrides everything except these commands
+COMMANDS = {"only ai news", "only tech news", "reset"}
+PREF_ACTIONS = {"AI": ai_news, "TECH": tech_news}
 
-    else:
-        reply = "Ask for AI news, tech news, or general news."
+# ================== CHAT ==================
+
+@app.post("/chat")
+async def chat(data: ChatRequest):
+    if not data.message.strip():
+        return {"reply": "Empty message."}
 
-    return {"reply": reply}
+    keyword = match_keyword(data.message)
+    pref = user_memory.get(data.user_id)
+
+    # Nothing to act on and no locked preference: skip the DB lookup
+    if keyword is None and pref is None:
+        return {"reply": HELP_REPLY}
+
+    user = db.execute(
+        SQL_USER_BY_ID,
+        (data.user_id,)
+    ).fetchone()
+
+    if not user:
+        return {"reply": "Invalid user. Please login again."}
+
+    action = ACTIONS[keyword]
+    if pref is not None and keyword not in COMMANDS:
+        action = PREF_ACTIONS[pref]
+
+    return {"reply": await action(data.user_id)}
 
 # ================== RUN ==================
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=True)
+
+    if os.getenv("RELOAD"):
+        # Single-process dev server
+        uvicorn.run("backend.main:app", host="0.0.0.0", port=8000, reload=True)
+    else:
+        # One worker per core; "auto" picks uvloop and httptools when installed.
+        # Caches and user_memory are per worker.
+        uvicorn.run(
+            "backend.main:app",
+            host="0.0.0.0",
+            port=8000,
+            workers=os.cpu_count(),
+            loop="auto",
+            http="auto",
+        )
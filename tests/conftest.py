@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# Keep the checked-in chat.db untouched
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(), "chat.db"))
@@ -0,0 +1,17 @@
+import pytest
+
+for module in ("fastapi", "httpx", "cachetools", "orjson"):
+    pytest.importorskip(module)
+
+from backend.main import match_keyword
+
+
+def test_priority_matches_old_ladder():
+    assert match_keyword("news about AI") == "ai"
+    assert match_keyword("Only AI News please") == "only ai news"
+    assert match_keyword("hello") is None
+
+
+@pytest.mark.parametrize("message", ["newſ", "reſet", "AİR", "aı"])
+def test_unicode_case_variants_do_not_raise(message):
+    assert match_keyword(message) is None
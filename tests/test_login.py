@@ -0,0 +1,59 @@
+import asyncio
+import hashlib
+
+import pytest
+
+for module in ("fastapi", "httpx", "cachetools", "orjson"):
+    pytest.importorskip(module)
+
+from backend import main
+
+
+@pytest.fixture
+def scrypt_calls(monkeypatch):
+    calls = []
+    real = main.hash_password
+
+    def counting(password, salt):
+        calls.append(salt)
+        return real(password, salt)
+
+    monkeypatch.setattr(main, "hash_password", counting)
+    return calls
+
+
+def login(username, password):
+    return asyncio.run(main.login(main.AuthRequest(username=username, password=password)))
+
+
+def add_legacy_user(username, password):
+    main.db.execute(
+        "INSERT INTO users (username, password) VALUES (?, ?)",
+        (username, hashlib.sha256(password.encode()).hexdigest())
+    )
+
+
+def test_unknown_user_spends_one_scrypt(scrypt_calls):
+    assert login("nobody", "pw") == {"error": "Invalid credentials"}
+    assert scrypt_calls == [main.DUMMY_SALT]
+
+
+def test_legacy_wrong_password_spends_one_scrypt(scrypt_calls):
+    add_legacy_user("legacy-wrong", "secret")
+
+    assert login("legacy-wrong", "nope") == {"error": "Invalid credentials"}
+    assert scrypt_calls == [main.DUMMY_SALT]
+
+
+def test_legacy_login_rehashes_to_scrypt(scrypt_calls):
+    add_legacy_user("legacy-ok", "secret")
+
+    reply = login("legacy-ok", "secret")
+    assert "user_id" in reply
+
+    row = main.db.execute(main.SQL_USER_BY_NAME, ("legacy-ok",)).fetchone()
+    assert row["salt"] is not None
+    assert main.verify_password("secret", row["password"], row["salt"])
+
+    assert login("legacy-ok", "secret") == reply
+    assert login("legacy-ok", "nope") == {"error": "Invalid credentials"}
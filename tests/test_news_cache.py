@@ -0,0 +1,168 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+for module in ("fastapi", "httpx", "cachetools", "orjson"):
+    pytest.importorskip(module)
+
+from backend import main
+
+
+class FakeClock:
+    # Runs ahead of the real clock so the event loop never sees time go back
+    def __init__(self):
+        self.offset = 0.0
+        self.real = time.monotonic
+
+    def __call__(self):
+        return self.real() + self.offset
+
+    def advance(self, seconds):
+        self.offset += seconds
+
+
+class FakeUpstream:
+    def __init__(self):
+        self.calls = []
+        self.results = []
+
+    async def __call__(self, query):
+        self.calls.append(query)
+        await asyncio.sleep(0)
+        return self.results.pop(0)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(main.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    upstream = FakeUpstream()
+    monkeypatch.setattr(main, "fetch_news_upstream", upstream)
+    monkeypatch.setattr(main, "redis_client", None)
+    for state in (main.news_cache, main.news_failures, main.news_locks, main.news_refreshing):
+        state.clear()
+    yield upstream
+    for state in (main.news_cache, main.news_failures, main.news_locks, main.news_refreshing):
+        state.clear()
+
+
+async def drain_refreshes():
+    await asyncio.gather(*list(main.news_refreshing.values()))
+
+
+def test_fresh_entry_skips_upstream(clock, upstream):
+    upstream.results = [["first"]]
+
+    async def run():
+        assert await main.fetch_news("AI") == ["first"]
+        clock.advance(main.NEWS_TTL - 1)
+        assert await main.fetch_news("AI") == ["first"]
+
+    asyncio.run(run())
+    assert upstream.calls == ["AI"]
+
+
+def test_concurrent_misses_share_one_call(clock, upstream):
+    upstream.results = [["first"]]
+
+    async def run():
+        return await asyncio.gather(*(main.fetch_news("AI") for _ in range(5)))
+
+    assert asyncio.run(run()) == [["first"]] * 5
+    assert upstream.calls == ["AI"]
+
+
+def test_stale_entry_served_while_one_refresh_runs(clock, upstream):
+    upstream.results = [["old"], ["new"]]
+
+    async def run():
+        await main.fetch_news("AI")
+        clock.advance(main.NEWS_TTL + 1)
+        assert await main.fetch_news("AI") == ["old"]
+        assert await main.fetch_news("AI") == ["old"]
+        assert list(main.news_refreshing) == ["AI"]
+        await drain_refreshes()
+        assert await main.fetch_news("AI") == ["new"]
+
+    asyncio.run(run())
+    assert upstream.calls == ["AI", "AI"]
+
+
+def test_expired_entry_waits_for_upstream(clock, upstream):
+    upstream.results = [["old"], ["new"]]
+
+    async def run():
+        await main.fetch_news("AI")
+        clock.advance(main.NEWS_STALE_TTL + 1)
+        assert await main.fetch_news("AI") == ["new"]
+
+    asyncio.run(run())
+    assert not main.news_refreshing
+
+
+def test_failure_is_negative_cached(clock, upstream):
+    upstream.results = [None]
+
+    async def run():
+        assert await main.fetch_news("AI") == []
+        assert await main.fetch_news("AI") == []
+
+    asyncio.run(run())
+    assert upstream.calls == ["AI"]
+    assert "AI" in main.news_failures
+
+
+def test_failed_refresh_keeps_stale_entry_and_blocks_retries(clock, upstream):
+    upstream.results = [["old"], None]
+
+    async def run():
+        await main.fetch_news("AI")
+        clock.advance(main.NEWS_TTL + 1)
+        assert await main.fetch_news("AI") == ["old"]
+        await drain_refreshes()
+
+        # Still served stale, and no new refresh while the failure is cached
+        assert await main.fetch_news("AI") == ["old"]
+        assert not main.news_refreshing
+
+    asyncio.run(run())
+    assert upstream.calls == ["AI", "AI"]
+    assert main.news_cache["AI"][0] == ["old"]
+
+
+class FakeRedis:
+    def __init__(self, titles, age):
+        self.raw = json.dumps({"titles": titles, "fetched_at": time.time() - age})
+        self.writes = []
+
+    async def get(self, key):
+        return self.raw
+
+    async def setex(self, key, ttl, value):
+        self.writes.append(key)
+
+
+def test_refresh_uses_recent_shared_copy(clock, upstream, monkeypatch):
+    monkeypatch.setattr(main, "redis_client", FakeRedis(["shared"], age=50))
+
+    asyncio.run(main.refresh_news("AI"))
+    assert upstream.calls == []
+    assert main.news_cache["AI"][0] == ["shared"]
+
+
+def test_warm_refresh_skips_aging_shared_copy(clock, upstream, monkeypatch):
+    redis = FakeRedis(["shared"], age=50)
+    monkeypatch.setattr(main, "redis_client", redis)
+    upstream.results = [["fresh"]]
+
+    asyncio.run(main.refresh_news("AI", main.WARM_MAX_SHARED_AGE))
+    assert upstream.calls == ["AI"]
+    assert main.news_cache["AI"][0] == ["fresh"]
+    assert redis.writes == ["news:AI"]